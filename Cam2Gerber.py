@@ -1,10 +1,10 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 #
 # Script to parse an Eagle-CAD CAM file, to produce Windows command lines
 # that are executed to produce Gerber plots and/or an Excellon drill file.
 #
 # Parameters:
-# -c<path of the .cam file> -b<path of the .brd file> [-e<path of the eaglecon.exe file>]
+# -c<path of the .cam file> -b<path of the .brd file> [-e<path of the eaglecon.exe file>] [-j<number of jobs>]
 #
 # Sample parameters:
 # -c"C:\Users\MyPie\Seeed_Gerber_Generator_4-layer_1-2-15-16.cam" -b"C:\Users\MyPie\schema.brd"
@@ -33,11 +33,17 @@
 # SOFTWARE.
 #
 #
-from subprocess import call
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import MappingProxyType
+import functools
 import re
 import os
+import string
+import subprocess
 import sys
 from optparse import OptionParser
+from unicodedata import normalize
+from xml.etree import ElementTree
 
 #----------------------------------------------
 r"""
@@ -52,6 +58,7 @@ Parameters
  -c<path of the .cam file>
  -b<path of the .brd file>
  -e<path of the eaglecon.exe file> (defaults to "C:\Program Files (x86)\EAGLE-6.5.0\bin\eaglecon.exe")
+ -j<number of Eagle commands to run at once> (defaults to 1)
 
 Outputs
 -------
@@ -86,7 +93,7 @@ complicated command-line parameters.
 Limitations
 -----------
 The Python script currently only supports the output of Extended Gerber (RS-274X) files and Excellon drill files.  It
-was written for EAGLE version 6.5.0 and Python version 2.7.5.
+was written for EAGLE version 6.5.0 and requires Python 3.7 or later.
 
 """
 #----------------------------------------------
@@ -119,6 +126,29 @@ def error(args):
     print(args)
 
 
+#----------------------------------------------
+g_nfcCache = {}
+
+
+def _nfc(text):
+    """ Return text in Unicode normalization form NFC, so that layer names which look the same
+    compare equal whether they came from the CAM file or the board file.
+
+    Results are cached, and ASCII text, which is always normalized, is returned as-is.
+    """
+    result = g_nfcCache.get(text)
+    if result is None:
+        result = text if text.isascii() else normalize('NFC', text)
+        g_nfcCache[text] = result
+    return result
+
+
+#----------------------------------------------
+# Regular expressions used while parsing, compiled once at import time.
+_SQ_BRACKETS_RE = re.compile(r'\[(.+)\]')
+_KEY_LANG_RE = re.compile(r'([^=\[]+)\[([^\]]+)\]="(.*)"$')
+
+
 #----------------------------------------------
 
 class CamFile:
@@ -127,9 +157,16 @@ class CamFile:
         if not os.path.exists(cam_file_path):
             error('Unable to open the CAM file path "{0}"'.format(cam_file_path))
         else:
-            handle = open(cam_file_path, 'r')
-            self.all_lines = handle.readlines()
-            handle.close()
+            with open(cam_file_path, 'rb') as handle:
+                raw_text = handle.read()
+            # Newer Eagle versions write UTF-8, older ones the Windows 8-bit code page.
+            encoding = 'utf-8-sig'
+            try:
+                raw_text.decode(encoding)
+            except UnicodeDecodeError:
+                encoding = 'latin-1'
+            # Split the bytes, so that only CR and LF end lines, and not e.g. a latin-1 '\x85'.
+            self.all_lines = [line.decode(encoding).rstrip() for line in raw_text.splitlines()]
             self.line_index = 0
             self.max_lines = len(self.all_lines)
             self.current_line_string = ""
@@ -138,113 +175,58 @@ class CamFile:
         """ Returns the next line from the CAM file, with trailing whitespace trimmed. """
         result = None
         if self.line_index < self.max_lines:
-            result = self.all_lines[self.line_index].rstrip()
+            result = self.all_lines[self.line_index]
             self.line_index += 1
         self.current_line_string = result
         return result
 
-    def is_line_prefix(self, prefix):
-        """ Check if the current line starts with a prefix string. """
-        result = False
-        if self.current_line_string[:len(prefix)] == prefix:
-            result = True
-        return result
-
-    def get_key_eq_value(self, key):
-        """ Check if a line starts with <key>=<value>, and if so
-         advances to the next CAM line and return the value string.
-        """
-        value = None
-        pattern = key + "="
-        if self.is_line_prefix(pattern):
-            value = self.current_line_string[len(pattern):]
-            self.get_next_line()
-        return value
-
-    def eof(self):
-        """ Return True if all CAM file lines have been processed."""
-        return self.line_index >= self.max_lines
-
-    def skip_blank_line(self):
-        """ Skip the current CAM file line if it is blank. """
-        result = False
-        if not self.current_line_string:
-            self.get_next_line()
-            result = True
-        return result
-
-    def get_key_lang_eq_quoted_val(self, key):
-        """ If the current line matches <key>[<languageCode>]="<value>",
-        then return a tuple with the languageCode and value, and
-        advance to the next line
-        """
-        result = []
-        pattern = key + r'\[(.+)\]="(.*)"'
-        match = re.match(pattern, self.current_line_string)
-        if match:
-            result.append(match.group(1))
-            result.append(match.group(2))
-            self.get_next_line()
-        return result
-
-    def get_multiple_key_lang_eq_quoted_val(self, key):
-        """ Match one or more lines matching <key>[<languageCode>]="<value>",
-        and if found, advance past them and return a dictionary with
-        languageCodes as keys mapping to the values.
-        """
-        matching_done = False
-        result_dict = {}
-        while not matching_done:
-            parts = self.get_key_lang_eq_quoted_val(key)
-            if parts:
-                result_dict[parts[0]] = parts[1]
-            else:
-                matching_done = True
-        return result_dict
-
     def get_val_in_sq_brackets(self):
         """ Check if the line starts with text in square brackets, and if so,
         advance to the next line and return the string found in the brackets.
         """
         result = None
-        pattern = r'\[(.+)\]'
-        match = re.match(pattern, self.current_line_string)
-        if match:
-            result = match.group(1)
-            self.get_next_line()
-        return result
-
-    def get_key_eq_quoted_val(self, key):
-        """ Check if a line starts with <key>="<value>", and if so
-         advance to the next line and return the value.
-        """
-        result = None
-        pattern = key + r'="(.*)"'
-        match = re.match(pattern, self.current_line_string)
-        if match:
-            result = match.group(1)
+        line = self.current_line_string
+        if len(line) > 2 and line[0] == '[' and line[-1] == ']' and ']' not in line[1:-1]:
+            # the usual section header line, such as "[Sec_1]"
+            result = line[1:-1]
             self.get_next_line()
+        else:
+            match = _SQ_BRACKETS_RE.match(line)
+            if match:
+                result = match.group(1)
+                self.get_next_line()
         return result
 
-    # generic parse of cam name/value pair
-    def get_key_value_pairs(self, key):
-        """ Checks if there are one or more lines of:
-         - <key>[<languageCode]="<value>",
-         or a single line of:
-         - <key>="<value">,
-         or a single line of:
+    def get_section_values(self, list_keys=()):
+        """ Parse the name/value lines of a section, advancing past them up to the
+        next blank line, section header or the end of the file.  Each line is one of:
+         - <key>[<languageCode>]="<value>",
+         - <key>="<value>",
          - <key>=<value>
-         and advances past these lines.
 
-         In the first case, a dictionary is returned mapping
-         languages to values.  In the second and third case,
-         the value string is returned.
+         A dictionary is returned mapping each key to a dictionary of languages to
+         values in the first case, or to the value string in the other cases.  Keys
+         in list_keys may occur on several lines, and are mapped to a list of values.
         """
-        result = self.get_multiple_key_lang_eq_quoted_val(key)
-        if not result:
-            result = self.get_key_eq_quoted_val(key)
-        if not result:
-            result = self.get_key_eq_value(key)
+        result = {}
+        line = self.current_line_string
+        while line and line[0] != '[':
+            eq = line.find('=')
+            if eq > 0:
+                key = line[:eq]
+                if key[-1] == ']':
+                    match = _KEY_LANG_RE.match(line)
+                    if match:
+                        result.setdefault(match.group(1), {})[match.group(2)] = match.group(3)
+                else:
+                    value = line[eq + 1:]
+                    if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+                        value = value[1:-1]
+                    if key in list_keys:
+                        result.setdefault(key, []).append(value)
+                    else:
+                        result[key] = value
+            line = self.get_next_line()
         return result
 
 
@@ -254,135 +236,155 @@ def parse_cam_file(cam_file_path):
     """ Parses a CAM file using the CamFile class, returning a dictionary with
     a description of the CAM job and sections describing each output file to be generated.
     """
-    done = False
     cam = CamFile(cam_file_path)
     big_result = {}
-    section_list = []
     if not cam.max_lines:
-        done = True
         error("Unable to open '{0}'.".format(cam_file_path))
-    if not done:
-        cam.get_next_line()
-        val = cam.get_val_in_sq_brackets()
-        if not ('CAM Processor Job' == val):
-            done = True
-            error("File '{0}' was not a CAM processor job.".format(cam_file_path))
-    if not done:
-        big_result['Description'] = cam.get_multiple_key_lang_eq_quoted_val('Description')
-
-    if not done:
-        maybe_section = True
-        while maybe_section:
-            section_value = cam.get_key_eq_value('Section')
-            if None != section_value:
-                section_list.append(section_value)
-            else:
-                maybe_section = False
-        if len(section_list) == 0:
-            done = True
-            error("No sections found in the CAM file.")
-    if not done:
-        big_result['Sections'] = []
+        return big_result
+    cam.get_next_line()
+    val = cam.get_val_in_sq_brackets()
+    if not ('CAM Processor Job' == val):
+        error("File '{0}' was not a CAM processor job.".format(cam_file_path))
+        return big_result
+    job_values = cam.get_section_values(list_keys=('Section',))
+    big_result['Description'] = job_values.get('Description', {})
+    section_list = job_values.get('Section', [])
+    if len(section_list) == 0:
+        error("No sections found in the CAM file.")
+        return big_result
+    big_result['Sections'] = []
     # parse multiple sections
-    while (not done) and (not cam.eof()):
-        section_results = {}
-        done = not cam.skip_blank_line()
-        if not done:
-            this_section = cam.get_val_in_sq_brackets()
-            if not (this_section and this_section in section_list):
-                done = True
-                warning("Section not found.")
-            else:
-                section_results['tag'] = this_section
-        if not done:
-            section_results['name'] = cam.get_key_value_pairs('Name')
-            section_results['prompt'] = cam.get_key_value_pairs('Prompt')
-            section_results['device'] = cam.get_key_value_pairs('Device')
-            if not section_results['device']:
-                done = True
-                error("Device specification not found.")
-        if not done:
-            section_results['wheel'] = cam.get_key_value_pairs('Wheel')
-            section_results['rack'] = cam.get_key_value_pairs('Rack')
-            section_results['scale'] = cam.get_key_value_pairs('Scale')
-            section_results['output'] = cam.get_key_value_pairs('Output')
-            if not section_results['output']:
-                done = True
-                error("Output file name not found.")
-        if not done:
-            section_results['flags'] = cam.get_key_value_pairs('Flags')
-            if not section_results['flags']:
-                done = True
-                error("Flags not found.")
-        if not done:
-            section_results['emulate'] = cam.get_key_value_pairs('Emulate')
-            if not section_results['emulate']:
-                done = True
-                error("Emulate not found.")
-        if not done:
-            section_results['offset'] = cam.get_key_value_pairs('Offset')
-            if not section_results['offset']:
-                done = True
-                error("Offset not found.")
-        if not done:
-            section_results['sheet'] = cam.get_key_value_pairs('Sheet')
-            section_results['tolerance'] = cam.get_key_value_pairs('Tolerance')
-            section_results['pen'] = cam.get_key_value_pairs('Pen')
-            section_results['page'] = cam.get_key_value_pairs('Page')
-
-            section_results['layers'] = cam.get_key_value_pairs('Layers')
-            if not section_results['layers']:
-                done = True
-                error("Layers not found")
-        if not done:
-            section_results['colors'] = cam.get_key_value_pairs('Colors')
-        if not done:
-            # Add section info to results
-            big_result['Sections'].append(section_results)
+    while True:
+        line = cam.current_line_string
+        while line == '':
+            line = cam.get_next_line()
+        if line is None:
+            break
+        this_section = cam.get_val_in_sq_brackets()
+        if not (this_section and this_section in section_list):
+            warning("Section not found.")
+            break
+        section_values = cam.get_section_values()
+        section_results = {'tag': this_section}
+        section_results['name'] = section_values.get('Name')
+        section_results['prompt'] = section_values.get('Prompt')
+        section_results['device'] = section_values.get('Device')
+        if not section_results['device']:
+            error("Device specification not found.")
+            break
+        section_results['wheel'] = section_values.get('Wheel')
+        section_results['rack'] = section_values.get('Rack')
+        section_results['scale'] = section_values.get('Scale')
+        section_results['output'] = section_values.get('Output')
+        if not section_results['output']:
+            error("Output file name not found.")
+            break
+        section_results['flags'] = section_values.get('Flags')
+        if not section_results['flags']:
+            error("Flags not found.")
+            break
+        section_results['emulate'] = section_values.get('Emulate')
+        if not section_results['emulate']:
+            error("Emulate not found.")
+            break
+        section_results['offset'] = section_values.get('Offset')
+        if not section_results['offset']:
+            error("Offset not found.")
+            break
+        section_results['sheet'] = section_values.get('Sheet')
+        section_results['tolerance'] = section_values.get('Tolerance')
+        section_results['pen'] = section_values.get('Pen')
+        section_results['page'] = section_values.get('Page')
+
+        section_results['layers'] = section_values.get('Layers')
+        if not section_results['layers']:
+            error("Layers not found")
+            break
+        section_results['colors'] = section_values.get('Colors')
+        # Add section info to results
+        big_result['Sections'].append(section_results)
     return big_result
 
 
 #----------------------------------------------
 
-def get_output_name(name_template, board_path):
+def get_name_replacements(board_path):
+    """ Returns a dictionary mapping the letter following each '%' in a CAM-name placeholder to its value.
+
+     boardPath is the path to the Eagle ".brd" file.
+    """
+    board_name, board_ext = os.path.splitext(os.path.basename(board_path))
+    return {'N': board_name, 'E': board_ext[1:], 'P': os.path.dirname(board_path),
+            'H': os.path.expanduser('~'), '%': '%'}
+
+
+def get_output_name(name_template, replacements):
     """ Returns a file name string without CAM-name placeholders, from a file name string that may contain them.
 
      nameTemplate is a string possibly containing placeholders, such as "%N.cmp".
-     boardPath is the path to the Eagle ".brd" file.
+     replacements is the dictionary of placeholder values returned by get_name_replacements().
     """
     result = None
-    if name_template and board_path:
-        replacement_dict = {'%N': os.path.splitext(os.path.basename(board_path))[0],
-                            '%E': os.path.splitext(os.path.basename(board_path))[1][1:],
-                            '%P': os.path.dirname(board_path), '%H': os.path.expanduser('~'), '%%': '%'}
-
-        #do the replacements here in one pass
-        rep = dict((re.escape(k), v) for k, v in replacement_dict.iteritems())
-        pattern = re.compile("|".join(rep.keys()))
-        result = pattern.sub(lambda m: rep[re.escape(m.group(0))], name_template)
+    if name_template and replacements:
+        # do the replacements here in one pass, copying the text between placeholders
+        parts = []
+        start = 0
+        percent = name_template.find('%')
+        while percent >= 0:
+            value = replacements.get(name_template[percent + 1:percent + 2])
+            if value is None:
+                # not a placeholder, so keep the '%'
+                parts.append(name_template[start:percent + 1])
+                start = percent + 1
+            else:
+                parts.append(name_template[start:percent])
+                parts.append(value)
+                start = percent + 2
+            percent = name_template.find('%', start)
+        parts.append(name_template[start:])
+        result = ''.join(parts)
     return result
 
 #----------------------------------------------
-g_boardLayerNumberToNameMap = {}
+@functools.lru_cache(maxsize=8)
+def _load_board_layer_map(board_path, mtime):
+    """ Parse a board file's layer table, returning a tuple of a read-only map of layer
+    numbers to layer names, and a read-only map from each layer number and NFC-normalized
+    layer name to the layer number or name as spelled in the board.
+
+    mtime is the board file's modification time, so that a changed board is parsed again.
+    """
+    layer_map = {}
+    # Only the <layers> table near the start of the board is needed, so stop parsing once it has been read.
+    with open(board_path, 'rb') as handle:
+        try:
+            for event, elem in ElementTree.iterparse(handle, events=('end',)):
+                if elem.tag == 'layer':
+                    number = elem.get('number')
+                    name = elem.get('name')
+                    if number is not None and name is not None:
+                        layer_map[number] = name
+                    elem.clear()
+                elif elem.tag == 'layers':
+                    break
+        except ElementTree.ParseError as e:
+            error('Unable to parse the board file "{0}": {1}'.format(board_path, e))
+    board_layer_tokens = dict((_nfc(name), name) for name in layer_map.values())
+    board_layer_tokens.update((number, number) for number in layer_map)
+    return MappingProxyType(layer_map), MappingProxyType(board_layer_tokens)
+
+
+def _get_board_layers(board_path):
+    """ Returns the cached (layer map, layer numbers and names) tuple of an Eagle board. """
+    if not os.path.exists(board_path):
+        error('Unable to open the board file "{0}".'.format(board_path))
+        return MappingProxyType({}), MappingProxyType({})
+    return _load_board_layer_map(board_path, os.path.getmtime(board_path))
 
 
 def get_board_layer_number_to_name_map(board_path):
     """ Returns a map of an Eagle board's layer numbers to layer names. """
-    if g_boardLayerNumberToNameMap:
-        # TODO: We might check that the board path hasn't changed before returning the previous map.
-        return g_boardLayerNumberToNameMap
-    if not os.path.exists(board_path):
-        error('Unable to open the board file "{0}".'.format(board_path))
-        return g_boardLayerNumberToNameMap
-    # TODO: We should ideally parse the board file as XML instead of using regular expressions to find layers.
-    pattern = r'<layer number="([0-9]+)" name="([^"]+)"'
-    handle = open(board_path, 'r')
-    all_lines = handle.readlines()
-    for line in all_lines:
-        match = re.match(pattern, line)
-        if match:
-            g_boardLayerNumberToNameMap[match.group(1)] = match.group(2)
-    return g_boardLayerNumberToNameMap
+    return _get_board_layers(board_path)[0]
 
 
 #----------------------------------------------
@@ -392,11 +394,13 @@ def get_valid_layers(layer_string, board_path, section_name):
     both in the board and in the layerString input.
     """
     valid_list = []
-    board_layer_number_to_name_map = get_board_layer_number_to_name_map(board_path)
+    board_layer_tokens = _get_board_layers(board_path)[1]
     layer_list = layer_string.split()
     for layer in layer_list:
-        if (layer in board_layer_number_to_name_map) or (layer in board_layer_number_to_name_map.values()):
-            valid_list.append(layer)
+        # compare names in NFC form, but pass the layer to Eagle as spelled in the board
+        board_layer = board_layer_tokens.get(_nfc(layer))
+        if board_layer is not None:
+            valid_list.append(board_layer)
         else:
             msg_string = "Eagle layer {0} in the CAM tab named '{1}' is not a layer listed in the board file."
             warning(msg_string.format(layer, section_name))
@@ -406,6 +410,11 @@ def get_valid_layers(layer_string, board_path, section_name):
 
 #----------------------------------------------
 
+# CAM-processor flag options, in the order of the CAM-file flag values, and their default values.
+_FLAG_LETTERS = ('m', 'r', 'u', 'c', 'q', 'O', 'f')
+_FLAG_DEFAULTS = ('0', '0', '0', '1', '0', '1', '1')
+_FLAG_SIGNS = {'0': '-', '1': '+'}
+
 
 # Convert CAM-file flag parameter to CAM-processor options:
 def get_flag_string(cam_section):
@@ -423,14 +432,9 @@ def get_flag_string(cam_section):
 
     A trailing '+" means the option's default is on, and '-' means it's off.
     """
-    result_string = ''
-    default_value = ' 0 0 0 1 0 1 1'.split()
-    flag_letters = 'm r u c q O f'.split()
-    raw_flag_list = cam_section['flags'].split()
-    for index, value in enumerate(raw_flag_list):
-        if value != default_value[index]:
-            result_string += ' -' + flag_letters[index] + ('+' if '1' == value else '-')
-    return result_string
+    return ''.join(' -' + _FLAG_LETTERS[index] + _FLAG_SIGNS.get(value, '-')
+                   for index, value in enumerate(cam_section['flags'].split())
+                   if value != _FLAG_DEFAULTS[index])
 
 
 #----------------------------------------------
@@ -445,25 +449,32 @@ def get_offsets(cam_section):
     }
     x_result = 0.0
     y_result = 0.0
-    pattern = r'^([-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?)(\S+)\s([-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?)(\S+)$'
-    match = re.match(pattern, cam_section['offset'])
-    if match:
-        x_result = float(match.group(1)) * float(units.get(match.group(5), 0))
-        y_result = float(match.group(6)) * float(units.get(match.group(10), 0))
+    tokens = cam_section['offset'].split()
+    if len(tokens) == 2:
+        try:
+            # the units string is the trailing run of letters, e.g. "1.5mm" or "-2e1mil"
+            x_number = tokens[0].rstrip(string.ascii_letters)
+            y_number = tokens[1].rstrip(string.ascii_letters)
+            x_result = float(x_number) * units.get(tokens[0][len(x_number):], 0)
+            y_result = float(y_number) * units.get(tokens[1][len(y_number):], 0)
+        except ValueError:
+            x_result = 0.0
+            y_result = 0.0
     return x_result, y_result
 
 
 #----------------------------------------------
 
-def get_eagle_command_from_cam_section(cam_section, board_path, eagle_path):
-    """Produce a Windows command to run Eagle to generate a CAM output file.
+def get_eagle_command_from_cam_section(cam_section, board_path, eagle_path, replacements):
+    """Produce the argument list of a command running Eagle to generate a CAM output file.
 
     camSection is a dictionary containing parameter info.
     boardpath is the path to the Eagle board file.
     eaglePath is the path to the eaglecon.exe file.
+    replacements is the dictionary of CAM-name placeholder values for the board.
     """
-    output_name = get_output_name(cam_section['output'], board_path)
-    wheel_name = get_output_name(cam_section['wheel'], board_path)
+    output_name = get_output_name(cam_section['output'], replacements)
+    wheel_name = get_output_name(cam_section['wheel'], replacements)
     in_name = cam_section['name']
     if isinstance(in_name, dict) and ('en' in in_name):
         section_name = in_name['en']
@@ -472,19 +483,17 @@ def get_eagle_command_from_cam_section(cam_section, board_path, eagle_path):
     valid_layers = get_valid_layers(cam_section['layers'], board_path, section_name)
     flag_string = get_flag_string(cam_section)
 
-    x_flag = ''
-    y_flag = ''
+    argv = [eagle_path] + flag_string.split() + ['-X', '-d' + cam_section['device'], '-o' + output_name]
+    if wheel_name:
+        argv.append('-W' + wheel_name)
     x_offset, y_offset = get_offsets(cam_section)
     if x_offset:
-        x_flag = ' -x' + str(x_offset)
+        argv.append('-x' + str(x_offset))
     if y_offset:
-        y_flag = ' -y' + str(y_offset)
-
-    command_string = ('"' + eagle_path + '"' + flag_string + ' -X -d"' + cam_section['device'] + '" -o"' + output_name +
-                      (('" -W"' + wheel_name) if wheel_name else '') +
-                      '"' + x_flag + y_flag +
-                      ' "' + board_path + '" ' + valid_layers)
-    return command_string
+        argv.append('-y' + str(y_offset))
+    argv.append(board_path)
+    argv += valid_layers.split()
+    return argv
 
 
 #----------------------------------------------
@@ -503,6 +512,9 @@ def main():
     parser.add_option("-e", "--eagle", dest="eagleFile", metavar="FILE",
                       default=r"C:\Program Files (x86)\EAGLE-6.5.0\bin\eaglecon.exe",
                       help="path of the 'eaglecon.exe' file")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", metavar="N",
+                      default=1,
+                      help="number of Eagle commands to run at once")
 
     (options, args) = parser.parse_args()
     my_cam_path = options.camFile
@@ -515,6 +527,8 @@ def main():
     if not os.path.exists(my_eagle_path):
         error('The file "{0}" does not exist.  Please specify the "eaglecon.exe" path using the -e parameter.'.format(
             my_eagle_path))
+    if options.jobs < 1:
+        error('The number of jobs must be at least 1.')
 
     if not g_errorCount:
         parse_result = parse_cam_file(my_cam_path)
@@ -522,19 +536,38 @@ def main():
     expected_devices = ["EXCELLON", "GERBER_RS274X", "GERBER_RS274X_25"]
 
     if 'Sections' in parse_result:
+        replacements = get_name_replacements(my_board)
+        eagle_commands = []
         for camSection in parse_result['Sections']:
-            eagle_command = get_eagle_command_from_cam_section(camSection, my_board, my_eagle_path)
-            print(eagle_command)
+            eagle_argv = get_eagle_command_from_cam_section(camSection, my_board, my_eagle_path, replacements)
+            print(subprocess.list2cmdline(eagle_argv))
             if not camSection['device'] in expected_devices:
                 warning(
                     'Device "{0}" is not supported, and the generated command line may be missing parameters. '
                     'Only "GERBER_RS274X", "GERBER_RS274X_25", and "EXCELLON" '
                     'are supported.'.format(camSection['device']))
-            return_code = call(eagle_command, shell=True)
-            print "return code: " + str(return_code)
-            if return_code < 0:
-                warning("Eagle CAD return code = {0}.".format(return_code))
-                # call('DIR /A-D /OD /TW "' + os.path.dirname(myBoard) + '"', shell=True)
+            eagle_commands.append((camSection['tag'], eagle_argv))
+        # Each command writes its own output file, so up to options.jobs of them may run at once.
+        # All command lines are printed above, before any of them is run.
+        with ThreadPoolExecutor(max_workers=options.jobs) as executor:
+            futures = dict((executor.submit(subprocess.run, eagle_argv, check=False), tag)
+                           for tag, eagle_argv in eagle_commands)
+            try:
+                for future in as_completed(futures):
+                    try:
+                        return_code = future.result().returncode
+                    except (OSError, ValueError, subprocess.SubprocessError) as e:
+                        error('Unable to run Eagle for the CAM section "{0}": {1}'.format(futures[future], e))
+                        continue
+                    print("return code: {0} ({1})".format(return_code, futures[future]))
+                    if return_code < 0:
+                        warning("Eagle CAD return code = {0}.".format(return_code))
+                        # call('DIR /A-D /OD /TW "' + os.path.dirname(myBoard) + '"', shell=True)
+            except BaseException:
+                # e.g. Ctrl-C: don't start the commands still waiting in the pool on the way out.
+                for future in futures:
+                    future.cancel()
+                raise
         print('*** CAM job completed with {0} warnings and {1} errors. ***'.format(g_warningCount, g_errorCount))
     else:
         print('*** CAM job did not run. ***')